@@ -12,7 +12,9 @@ class Config:
     OUTPUT_FILE = 'agg_trades_weekly.csv'
     TOP_CLIENTS_VOLUME_FILE = 'top_clients_by_volume.csv'
     TOP_CLIENTS_PNL_FILE = 'top_clients_by_pnl.csv'
+    OUTPUT_FORMAT = 'csv'  # 'parquet' writes the same outputs as .parquet files
     
     # Processing settings
     CHUNK_SIZE = 10000  # For large files
+    TRANSFORM_ENGINE = 'pandas'  # 'polars' runs cleaning and aggregation as one lazy polars query
     DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
\ No newline at end of file
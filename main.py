@@ -1,26 +1,40 @@
+import pandas as pd
 from pathlib import Path
 from config.config import Config
 from src.extract import DataExtractor
 from src.transform import DataTransformer
 from src.load import DataLoader
 
+# Filtered frames share memory with their parent until written to, so no defensive copies are needed
+pd.set_option('mode.copy_on_write', True)
+
 def main():
     """Main ETL pipeline"""
     try:
         # Extract
         input_path = Path(Config.INPUT_DIR) / Config.INPUT_FILE
         extractor = DataExtractor(input_path)
-        df = extractor.extract()
-        
-        # Transform
         transformer = DataTransformer(date_format=Config.DATE_FORMAT)
-        agg_df, client_pnl_df = transformer.transform(df)
+        
+        if Config.TRANSFORM_ENGINE == 'polars':
+            lf = extractor.scan()
+            
+            # Transform
+            agg_df, client_pnl_df = transformer.transform_pl(lf)
+        else:
+            df = extractor.extract()
+            
+            # Transform
+            agg_df, client_pnl_df = transformer.transform(df)
         
         # Load
         loader = DataLoader(output_dir=Config.OUTPUT_DIR)
         
         # 1. Load aggregated trades weekly
-        loader.load(agg_df, Config.OUTPUT_FILE)
+        if Config.OUTPUT_FORMAT == 'parquet':
+            loader.load_parquet(agg_df, Config.OUTPUT_FILE)
+        else:
+            loader.load(agg_df, Config.OUTPUT_FILE)
         
         # 2. Load all analytics (top volume + top pnl)
         loader.load_all_analytics(agg_df, client_pnl_df, Config)
@@ -5,10 +5,35 @@ class DataExtractor:
     def __init__(self, input_path):
         self.input_path = Path(input_path)
     
-    def extract(self):
-        """Extract data from CSV file"""
+    def extract(self, chunk_size=None):
+        """
+        Extract data from CSV file.
+        
+        With chunk_size set, returns an iterator of DataFrames with at most
+        chunk_size rows each instead of reading the whole file at once.
+        """
+        if not self.input_path.exists():
+            raise FileNotFoundError(f"Input file not found: {self.input_path}")
+        
+        # Low-cardinality string keys are dictionary-encoded so groupbys hash small int codes
+        dtype = {'client_type': 'category', 'symbol': 'category', 'side': 'category'}
+        
+        if chunk_size:
+            # The pyarrow engine does not support chunksize
+            return pd.read_csv(self.input_path, chunksize=chunk_size, dtype=dtype)
+        
+        try:
+            # Multi-threaded Arrow parser; also infers the timestamp column as datetime
+            df = pd.read_csv(self.input_path, engine='pyarrow', dtype=dtype)
+        except ImportError:
+            df = pd.read_csv(self.input_path, dtype=dtype)
+        return df
+    
+    def scan(self):
+        """Lazily scan CSV file with polars"""
+        import polars as pl
+        
         if not self.input_path.exists():
             raise FileNotFoundError(f"Input file not found: {self.input_path}")
         
-        df = pd.read_csv(self.input_path)
-        return df
\ No newline at end of file
+        return pl.scan_csv(self.input_path)
\ No newline at end of file
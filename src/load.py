@@ -21,6 +21,19 @@ class DataLoader:
         print(f"Saved {file_name} to {file_path}")
         return file_path
     
+    def load_parquet(self, df, file_name, index=False):
+        """Load data to Parquet file, replacing the file name extension with .parquet"""
+        import pyarrow as pa
+        
+        self.validate_data(df)
+        file_path = self.output_dir / Path(file_name).with_suffix('.parquet')
+        if 'weekly_start_date' in df and pd.api.types.is_datetime64_any_dtype(df['weekly_start_date']):
+            # Stored as Parquet date32, matching the YYYY-MM-DD dates in the CSV output
+            df = df.assign(weekly_start_date=df['weekly_start_date'].astype(pd.ArrowDtype(pa.date32())))
+        df.to_parquet(file_path, engine='pyarrow', compression='zstd', index=index)
+        print(f"Saved {file_path.name} to {file_path}")
+        return file_path
+    
     def load_all_analytics(self, agg_df, client_pnl_df, config, client_type='bronze', top_n=3):
         """
         Calculate and load all analytics outputs.
@@ -28,7 +41,7 @@ class DataLoader:
         Args:
             agg_df: Aggregated trades DataFrame
             client_pnl_df: Client PnL DataFrame
-            config: Config object with file names
+            config: Config object with file names and output format
             client_type: Type of client to filter (default: 'bronze')
             top_n: Number of top clients to return (default: 3)
         
@@ -36,22 +49,24 @@ class DataLoader:
             dict with output paths
         """
         paths = {}
+        save = self.load_parquet if config.OUTPUT_FORMAT == 'parquet' else self.load
         
         # Top clients by volume
         filtered = agg_df[agg_df['client_type'] == client_type]
-        top_volume = filtered.groupby('user_id').agg({
-            'trade_volume': 'sum',
-            'trade_count': 'sum'
-        }).reset_index()
-        top_volume = top_volume.nlargest(top_n, 'trade_volume')
-        top_volume['trade_volume'] = top_volume['trade_volume'].round(2)
-        paths['volume'] = self.load(top_volume, config.TOP_CLIENTS_VOLUME_FILE)
+        top_volume = (
+            filtered.groupby('user_id', observed=True)
+            .agg(trade_volume=('trade_volume', 'sum'), trade_count=('trade_count', 'sum'))
+            .nlargest(top_n, 'trade_volume')
+            .round({'trade_volume': 2})
+            .reset_index()
+        )
+        paths['volume'] = save(top_volume, config.TOP_CLIENTS_VOLUME_FILE)
         
         # Top clients by PnL
         filtered_pnl = client_pnl_df[client_pnl_df['client_type'] == client_type]
         top_pnl = filtered_pnl.nlargest(top_n, 'total_pnl')[
             ['user_id', 'unrealized_pnl', 'realized_pnl', 'total_pnl']
         ].reset_index(drop=True)
-        paths['pnl'] = self.load(top_pnl, config.TOP_CLIENTS_PNL_FILE)
+        paths['pnl'] = save(top_pnl, config.TOP_CLIENTS_PNL_FILE)
         
         return paths
\ No newline at end of file
@@ -5,8 +5,115 @@ Transform data according to business logic
 3. Calculate FIFO PnL for closed positions only
 4. Calculate total PnL using weighted average prices
 '''
+import numpy as np
 import pandas as pd
-from collections import deque
+from pandas.api.types import union_categoricals
+
+try:
+    from numba import njit, prange
+except ImportError:
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Fall back to plain Python kernels when numba is not installed"""
+        return lambda func: func
+
+
+def _categorize(df):
+    """Convert string key columns to categoricals so groupbys and sorts work on integer codes"""
+    to_convert = {
+        col: 'category'
+        for col in ['client_type', 'symbol', 'side']
+        if not isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+    return df.astype(to_convert) if to_convert else df
+
+
+def _codes(series):
+    """Integer codes of a key column; categoricals reuse their existing codes"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.int64)
+    return pd.factorize(series)[0]
+
+
+def _side_sign(side):
+    """Trade direction as int8: +1 for buys, -1 otherwise"""
+    return np.where((side == 'buy').to_numpy(), 1, -1).astype(np.int8)
+
+
+@njit(cache=True, parallel=True)
+def _fifo_kernel(group_start, group_end, slot_id, qty, price, direction, slot_last_price,
+                 out_volume, out_count, out_realized, out_unrealized):
+    """
+    Aggregate trades and match them FIFO over rows sorted by group and timestamp.
+    
+    Groups never share positions, so they are processed in parallel. Open
+    positions of a group live in its own segment of preallocated buffers
+    between head and tail; they all share one direction, so a trade either
+    closes lots from the head or opens a new lot at the tail.
+    """
+    n = len(qty)
+    pos_qty = np.empty(n, dtype=np.float64)
+    pos_price = np.empty(n, dtype=np.float64)
+    pos_dir = np.empty(n, dtype=np.int8)
+    
+    for g in prange(len(group_start)):
+        start = group_start[g]
+        end = group_end[g]
+        head = start
+        tail = start
+        
+        for i in range(start, end):
+            slot = slot_id[i]
+            trade_price = price[i]
+            trade_direction = direction[i]
+            remaining_qty = qty[i]
+            
+            # Trades missing a quantity or price add no volume and are not counted
+            trade_volume = remaining_qty * trade_price
+            if not np.isnan(trade_volume):
+                out_volume[slot] += trade_volume
+                out_count[slot] += 1
+            
+            while remaining_qty > 0 and head < tail and pos_dir[head] != trade_direction:
+                close_qty = min(remaining_qty, pos_qty[head])
+                
+                if pos_dir[head] == 1:
+                    out_realized[slot] += (trade_price - pos_price[head]) * close_qty
+                else:
+                    out_realized[slot] += (pos_price[head] - trade_price) * close_qty
+                
+                remaining_qty -= close_qty
+                
+                if close_qty >= pos_qty[head]:
+                    head += 1
+                else:
+                    pos_qty[head] -= close_qty
+            
+            if remaining_qty > 0:
+                pos_qty[tail] = remaining_qty
+                pos_price[tail] = trade_price
+                pos_dir[tail] = trade_direction
+                tail += 1
+            
+            # Last trade of the (group, week) slot: mark open positions to the week's last price
+            if i == end - 1 or slot_id[i + 1] != slot:
+                out_unrealized[slot] = np.sum(
+                    (slot_last_price[slot] - pos_price[head:tail]) * pos_dir[head:tail] * pos_qty[head:tail]
+                )
+
+
+@njit(cache=True)
+def _running_sum(values, group_start):
+    """Running sum of values that restarts at every row flagged in group_start"""
+    out = np.empty_like(values)
+    total = 0.0
+    for i in range(len(values)):
+        if group_start[i]:
+            total = 0.0
+        total += values[i]
+        out[i] = total
+    return out
 
 
 class DataTransformer:
@@ -15,110 +122,108 @@ class DataTransformer:
 
     def clean_data(self, df):
         """Clean and validate data"""
-        df = df.drop_duplicates()
-        df = df.dropna(subset=['timestamp', 'user_id', 'symbol', 'side'])
-        return df
+        # One row selection instead of materializing drop_duplicates and dropna results separately
+        keep = ~df.duplicated() & df[['timestamp', 'user_id', 'symbol', 'side']].notna().all(axis=1)
+        df = df[keep]
+        # side_sign is +1 for buys and -1 otherwise, so the FIFO step never compares side strings
+        return df.assign(side_sign=_side_sign(df['side']))
 
     def parse_dates(self, df):
         """Parse timestamp column"""
-        df['timestamp'] = pd.to_datetime(
+        return df.assign(timestamp=pd.to_datetime(
             df['timestamp'],
             format=self.date_format,
             errors='coerce'
-        )
-        return df
+        ))
 
     def create_weekly_date(self, df):
         """Create weekly start date (Monday)"""
-        df['weekly_start_date'] = (
-            df['timestamp']
-            .dt.to_period('W-MON')
-            .dt.to_timestamp()
-            .dt.date
-        )
-        return df
+        days = df['timestamp'].to_numpy().astype('datetime64[D]')
+        # Same buckets as to_period('W-MON'): weeks end on Monday, so they start on Tuesday.
+        # Day 0 of the epoch is a Thursday, two days after the bucket start; NaT stays NaT.
+        return df.assign(weekly_start_date=days - ((days.view('int64') + 2) % 7).astype('timedelta64[D]'))
 
     def calculate_fifo_pnl(self, df):
         """
-        Calculate FIFO PnL for each week.
+        Aggregate trades and calculate FIFO PnL for each week.
         
-        Returns DataFrame with:
+        Returns DataFrame sorted by weekly_start_date, user_id, client_type, symbol with:
+        - trade_volume: sum of quantity * price
+        - trade_count: number of trades with both quantity and price
         - unrealized_pnl: PnL from open positions at week's last price
         - realized_pnl: PnL from closed positions in that week
         - total_pnl: realized_pnl + unrealized_pnl
         """
-        df_sorted = df.sort_values(['user_id', 'client_type', 'symbol', 'timestamp']).copy()
-        
-        df_for_prices = df.sort_values('timestamp')
-        last_prices = df_for_prices.groupby(['weekly_start_date', 'symbol'], as_index=False).agg(
-            last_price=('price', 'last')
+        key_cols = ['weekly_start_date', 'user_id', 'client_type', 'symbol']
+        df = df.dropna(subset=key_cols)
+        
+        key_codes = [_codes(df[col]) for col in ['user_id', 'client_type', 'symbol']]
+        group_id = np.ravel_multi_index(key_codes, [codes.max(initial=0) + 1 for codes in key_codes])
+        week_id = pd.factorize(df['weekly_start_date'])[0]
+        timestamp = df['timestamp'].to_numpy().view('int64')
+        price = df['price'].to_numpy(dtype=np.float64)
+        
+        # transform() passes trades already sorted by time; only sort here if called on unsorted data
+        if df['timestamp'].is_monotonic_increasing:
+            by_time = np.arange(len(df))
+        else:
+            by_time = np.argsort(timestamp, kind='stable')
+        
+        # Last price of every (week, symbol), keyed by integer codes instead of a groupby + join
+        symbol_id = key_codes[2]
+        price_key = week_id * (symbol_id.max(initial=0) + 1) + symbol_id
+        # Trades without a price are skipped, as groupby 'last' did; a (week, symbol) with none stays NaN
+        latest_first = by_time[::-1]
+        latest_first = latest_first[~np.isnan(price[latest_first])]
+        price_keys, last_trade = np.unique(price_key[latest_first], return_index=True)
+        last_price = price[latest_first][last_trade]
+        
+        order = by_time[np.argsort(group_id[by_time], kind='stable')]
+        group_id = group_id[order]
+        week_id = week_id[order]
+        qty = df['quantity'].to_numpy(dtype=np.float64)[order]
+        price = price[order]
+        if 'side_sign' in df:
+            direction = df['side_sign'].to_numpy()[order]
+        else:
+            direction = _side_sign(df['side'])[order]
+        
+        # Rows are sorted by group then timestamp, so every group and every (group, week) slot is contiguous
+        group_boundary = np.ones(len(order), dtype=bool)
+        group_boundary[1:] = np.diff(group_id) != 0
+        group_start = np.flatnonzero(group_boundary)
+        group_end = np.append(group_start[1:], len(order))
+        
+        slot_boundary = group_boundary.copy()
+        slot_boundary[1:] |= np.diff(week_id) != 0
+        slot_start = np.flatnonzero(slot_boundary)
+        slot_id = np.cumsum(slot_boundary) - 1
+        
+        result = df.iloc[order[slot_start]][key_cols].reset_index(drop=True)
+        slot_key = price_key[order[slot_start]]
+        hit = np.searchsorted(price_keys, slot_key)
+        found = hit < len(price_keys)
+        found[found] = price_keys[hit[found]] == slot_key[found]
+        slot_last_price = np.full(len(slot_key), np.nan)
+        slot_last_price[found] = last_price[hit[found]]
+        
+        volume = np.zeros(len(slot_start), dtype=np.float64)
+        count = np.zeros(len(slot_start), dtype=np.int64)
+        realized = np.zeros(len(slot_start), dtype=np.float64)
+        unrealized = np.zeros(len(slot_start), dtype=np.float64)
+        _fifo_kernel(
+            group_start, group_end, slot_id, qty, price, direction, slot_last_price,
+            volume, count, realized, unrealized
         )
         
-        results = []
+        result['trade_volume'] = np.round(volume, 2)
+        result['trade_count'] = count
+        # A lot opened at a missing price makes its group's PnL NaN; those weeks report 0 PnL
+        pnl = {'unrealized_pnl': unrealized, 'realized_pnl': realized, 'total_pnl': realized + unrealized}
+        for col, values in pnl.items():
+            result[col] = np.where(np.isnan(values), 0.0, np.round(values, 2))
         
-        for (user_id, client_type, symbol), group in df_sorted.groupby(['user_id', 'client_type', 'symbol']):
-            open_positions = deque()
-            
-            for week, week_data in group.groupby('weekly_start_date'):
-                week_realized_pnl = 0.0
-                
-                last_price = last_prices[
-                    (last_prices['weekly_start_date'] == week) & 
-                    (last_prices['symbol'] == symbol)
-                ]['last_price'].iloc[0]
-                
-                for _, trade in week_data.iterrows():
-                    trade_qty = trade['quantity']
-                    trade_price = trade['price']
-                    trade_side = trade['side']
-                    trade_direction = 1 if trade_side == 'buy' else -1
-                    remaining_qty = trade_qty
-                    
-                    while remaining_qty > 0 and open_positions:
-                        pos_qty, pos_price, pos_direction = open_positions[0]
-                        
-                        if pos_direction != trade_direction:
-                            close_qty = min(remaining_qty, pos_qty)
-                            
-                            if pos_direction == 1:
-                                pnl = (trade_price - pos_price) * close_qty
-                            else:
-                                pnl = (pos_price - trade_price) * close_qty
-                            
-                            week_realized_pnl += pnl
-                            remaining_qty -= close_qty
-                            
-                            if close_qty >= pos_qty:
-                                open_positions.popleft()
-                            else:
-                                open_positions[0] = (pos_qty - close_qty, pos_price, pos_direction)
-                        else:
-                            break
-                    
-                    if remaining_qty > 0:
-                        open_positions.append((remaining_qty, trade_price, trade_direction))
-                
-                week_unrealized_pnl = 0.0
-                for pos_qty, pos_price, pos_direction in open_positions:
-                    if pos_direction == 1:
-                        unrealized = (last_price - pos_price) * pos_qty
-                    else:
-                        unrealized = (pos_price - last_price) * pos_qty
-                    week_unrealized_pnl += unrealized
-                
-                week_total_pnl = week_realized_pnl + week_unrealized_pnl
-                
-                results.append({
-                    'weekly_start_date': week,
-                    'user_id': user_id,
-                    'client_type': client_type,
-                    'symbol': symbol,
-                    'unrealized_pnl': round(week_unrealized_pnl, 2),
-                    'realized_pnl': round(week_realized_pnl, 2),
-                    'total_pnl': round(week_total_pnl, 2)
-                })
-        
-        return pd.DataFrame(results)
+        return result.sort_values(key_cols, ignore_index=True)
     
     def calculate_client_pnl(self, df):
         """
@@ -129,49 +234,43 @@ class DataTransformer:
         - realized_pnl: PnL from closed positions
         - total_pnl: unrealized_pnl + realized_pnl
         """
-        df = df.copy()
-        
         if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
-            df['timestamp'] = pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+            df = df.assign(timestamp=pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', errors='coerce'))
         
         df = df.dropna(subset=['timestamp'])
+        df_sorted = df
+        if not df['timestamp'].is_monotonic_increasing:
+            df_sorted = df.sort_values('timestamp', kind='stable')
+        
+        # groupby 'last' skips missing prices, so drop them before taking the last row per symbol
+        last_prices = (
+            df_sorted.dropna(subset=['price'])
+            .drop_duplicates('symbol', keep='last')[['symbol', 'price']]
+            .rename(columns={'price': 'last_price'})
+        )
         
-        df_sorted = df.sort_values('timestamp')
-        last_trades = df_sorted.groupby('symbol').agg(
-            last_price=('price', 'last')
-        ).reset_index()
-        
-        last_prices = last_trades[['symbol', 'last_price']]
-        
-        df['volume'] = df['quantity'] * df['price']
-        
-        agg_df = df.groupby(['user_id', 'client_type', 'symbol', 'side']).agg({
-            'quantity': 'sum',
-            'volume': 'sum'
-        }).reset_index()
-        
-        agg_df['avg_price'] = agg_df['volume'] / agg_df['quantity']
-        
-        buy_df = agg_df[agg_df['side'] == 'buy'][['user_id', 'client_type', 'symbol', 'quantity', 'avg_price', 'volume']].copy()
-        buy_df.columns = ['user_id', 'client_type', 'symbol', 'buy_quantity', 'avg_buy_price', 'buy_volume']
-        
-        sell_df = agg_df[agg_df['side'] == 'sell'][['user_id', 'client_type', 'symbol', 'quantity', 'avg_price', 'volume']].copy()
-        sell_df.columns = ['user_id', 'client_type', 'symbol', 'sell_quantity', 'avg_sell_price', 'sell_volume']
-        
-        result = pd.merge(
-            buy_df, 
-            sell_df, 
-            on=['user_id', 'client_type', 'symbol'], 
-            how='outer'
+        # Buy and sell totals side by side, one row per user_id, client_type, symbol
+        wide = (
+            df.assign(volume=df['quantity'] * df['price'])
+            .groupby(['user_id', 'client_type', 'symbol', 'side'], observed=True)[['quantity', 'volume']]
+            .sum()
+            .unstack('side', fill_value=0.0)
+            .reindex(columns=pd.MultiIndex.from_product([['quantity', 'volume'], ['buy', 'sell']]), fill_value=0.0)
         )
-        result = result.fillna(0)
-        
-        result['realized_quantity'] = result[['buy_quantity', 'sell_quantity']].min(axis=1)
-        mask_has_both = (result['buy_quantity'] > 0) & (result['sell_quantity'] > 0)
-        result['realized_pnl'] = 0.0
-        result.loc[mask_has_both, 'realized_pnl'] = (
-            (result.loc[mask_has_both, 'avg_sell_price'] - result.loc[mask_has_both, 'avg_buy_price']) * 
-            result.loc[mask_has_both, 'realized_quantity']
+        wide.columns = ['buy_quantity', 'sell_quantity', 'buy_volume', 'sell_volume']
+        result = wide.reset_index()
+        
+        result['avg_buy_price'] = result['buy_volume'] / result['buy_quantity']
+        result['avg_sell_price'] = result['sell_volume'] / result['sell_quantity']
+        
+        buy_quantity = result['buy_quantity'].to_numpy()
+        sell_quantity = result['sell_quantity'].to_numpy()
+        result['realized_quantity'] = np.minimum(buy_quantity, sell_quantity)
+        # np.where rather than multiplying by the mask: one-sided rows have a NaN average price
+        result['realized_pnl'] = np.where(
+            (buy_quantity > 0) & (sell_quantity > 0),
+            (result['avg_sell_price'] - result['avg_buy_price']).to_numpy() * result['realized_quantity'].to_numpy(),
+            0.0
         )
         
         result['net_position'] = result['buy_quantity'] - result['sell_quantity']
@@ -180,77 +279,109 @@ class DataTransformer:
         
         result = result.merge(last_prices, on='symbol', how='left')
         
-        result['unrealized_pnl'] = 0.0
-        
-        long_mask = result['net_position'] > 0
-        result.loc[long_mask, 'unrealized_pnl'] = (
-            (result.loc[long_mask, 'last_price'] - result.loc[long_mask, 'avg_net_price']) 
-            * result.loc[long_mask, 'net_position']
-        )
+        # Signed net_position covers longs and shorts in one expression. Flat rows have a NaN or
+        # inf average price (x / 0), so their product is discarded by np.where without a warning
+        net_position = result['net_position'].to_numpy()
+        with np.errstate(invalid='ignore'):
+            unrealized = (result['last_price'] - result['avg_net_price']).to_numpy() * net_position
+        result['unrealized_pnl'] = np.where(net_position != 0, unrealized, 0.0)
         
-
-        short_mask = result['net_position'] < 0
-        result.loc[short_mask, 'unrealized_pnl'] = (
-            (result.loc[short_mask, 'avg_net_price'] - result.loc[short_mask, 'last_price']) 
-            * abs(result.loc[short_mask, 'net_position']) 
-        )
-    
         result['total_pnl'] = result['realized_pnl'] + result['unrealized_pnl']
         
-        user_pnl = result.groupby(['user_id', 'client_type']).agg({
-            'unrealized_pnl': 'sum',
-            'realized_pnl': 'sum',
-            'total_pnl': 'sum'
-        }).reset_index()
-        
-        user_pnl['unrealized_pnl'] = user_pnl['unrealized_pnl'].round(2)
-        user_pnl['realized_pnl'] = user_pnl['realized_pnl'].round(2)
-        user_pnl['total_pnl'] = user_pnl['total_pnl'].round(2)
+        pnl_cols = ['unrealized_pnl', 'realized_pnl', 'total_pnl']
+        user_pnl = result.groupby(['user_id', 'client_type'], observed=True)[pnl_cols].sum().reset_index()
         
-        return user_pnl[['user_id', 'client_type', 'unrealized_pnl', 'realized_pnl', 'total_pnl']]
+        return user_pnl[['user_id', 'client_type'] + pnl_cols].round(dict.fromkeys(pnl_cols, 2))
 
-    def aggregate_trades(self, df):
-        """Aggregate trades by weekly_start_date, user_id, client_type, symbol"""
-        groupby_cols = ['weekly_start_date', 'user_id', 'client_type', 'symbol']
-
-        df_temp = df.copy()
-        df_temp['trade_volume'] = df_temp['quantity'] * df_temp['price']
-        
-        agg_df = df_temp.groupby(groupby_cols).agg(
-            trade_volume=('trade_volume', 'sum'),
-            trade_count=('trade_volume', 'count')
-        ).reset_index()
-        
-        agg_df['trade_volume'] = agg_df['trade_volume'].round(2)
-        
-        agg_df['cumulative_trade_volume'] = agg_df.groupby(['user_id', 'client_type'])['trade_volume'].cumsum()
-        agg_df['cumulative_trade_volume'] = agg_df['cumulative_trade_volume'].round(2)
-        
+    def add_cumulative_volume(self, agg_df):
+        """Add running trade volume per user_id, client_type over the sorted weekly aggregate"""
+        # Stable sort keeps each user's weeks in row order, so a single pass with resets matches groupby cumsum
+        user_id = _codes(agg_df['user_id'])
+        client_id = _codes(agg_df['client_type'])
+        order = np.lexsort((client_id, user_id))
+        group_start = np.ones(len(order), dtype=np.bool_)
+        group_start[1:] = (np.diff(user_id[order]) != 0) | (np.diff(client_id[order]) != 0)
+        
+        cumulative = np.empty(len(order))
+        cumulative[order] = _running_sum(agg_df['trade_volume'].to_numpy(dtype=np.float64)[order], group_start)
+        agg_df.insert(
+            agg_df.columns.get_loc('trade_count') + 1,
+            'cumulative_trade_volume',
+            np.round(cumulative, 2)
+        )
         return agg_df
 
     def transform(self, df):
         """Main transformation pipeline"""
-        df_cleaned = self.clean_data(df)
+        df_cleaned = _categorize(self.clean_data(df))
         
-        client_pnl_df = self.calculate_client_pnl(df_cleaned)
-        
-        df_weekly = self.parse_dates(df_cleaned.copy())
+        # Sort trades by time once; both PnL steps rely on this order instead of sorting again
+        df_weekly = self.parse_dates(df_cleaned).sort_values('timestamp', kind='stable', ignore_index=True)
         df_weekly = self.create_weekly_date(df_weekly)
         
-        agg_df = self.aggregate_trades(df_weekly)
-        pnl_df = self.calculate_fifo_pnl(df_weekly)
+        client_pnl_df = self.calculate_client_pnl(df_weekly)
+        agg_df = self.calculate_fifo_pnl(df_weekly)
         
-        result = agg_df.merge(
-            pnl_df,
-            on=['weekly_start_date', 'user_id', 'client_type', 'symbol'],
-            how='left'
+        return self.add_cumulative_volume(agg_df), client_pnl_df
+
+    def transform_pl(self, lf):
+        """
+        Transformation pipeline on a polars LazyFrame.
+        
+        Cleaning, date parsing and weekly bucketing run as one lazy query,
+        so polars can fuse the steps and execute them multi-threaded. The
+        weekly aggregation and FIFO PnL are sequential per (user, symbol)
+        and are handed to the same NumPy kernel as the pandas pipeline.
+        """
+        import polars as pl
+        
+        # Same buckets as to_period('W-MON'): weeks end on Monday, so they start on Tuesday
+        df_weekly = (
+            lf.unique(maintain_order=True)
+            .drop_nulls(subset=['timestamp', 'user_id', 'symbol', 'side'])
+            .with_columns(pl.col('timestamp').str.to_datetime(self.date_format, strict=False))
+            .drop_nulls(subset=['timestamp'])
+            .sort('timestamp', maintain_order=True)
+            .with_columns(
+                weekly_start_date=pl.col('timestamp').dt.date()
+                - pl.duration(days=(pl.col('timestamp').dt.weekday() - 2) % 7),
+                side_sign=pl.when(pl.col('side') == 'buy').then(1).otherwise(-1).cast(pl.Int8)
+            )
+            .collect()
+            .to_pandas()
         )
+        df_weekly = _categorize(df_weekly)
         
-        result['realized_pnl'] = result['realized_pnl'].fillna(0)
-        result['unrealized_pnl'] = result['unrealized_pnl'].fillna(0)
-        result['total_pnl'] = result['total_pnl'].fillna(0)
+        client_pnl_df = self.calculate_client_pnl(df_weekly)
+        agg_df = self.calculate_fifo_pnl(df_weekly)
         
-        return result, client_pnl_df
+        return self.add_cumulative_volume(agg_df), client_pnl_df
+
+    def transform_chunks(self, chunks):
+        """
+        Transformation pipeline for input read in chunks.
+        
+        Each chunk is parsed, stripped of incomplete rows and deduplicated on
+        its own, so only one chunk of raw timestamp strings is held at a time.
+        Duplicates can span chunks and FIFO PnL needs every trade of a
+        (user, symbol) in order, so the rest of the pipeline still runs on
+        the concatenated frame and gives the same result as transform().
+        """
+        parsed = [
+            self.parse_dates(chunk).dropna(subset=['timestamp', 'user_id', 'symbol', 'side']).drop_duplicates()
+            for chunk in chunks
+        ]
+        
+        # Chunks carry different categories, which pd.concat would widen to object columns.
+        # Sorted categories match a single read, so output order and running sums agree with it
+        category_cols = [col for col in ['client_type', 'symbol', 'side']
+                         if isinstance(parsed[0][col].dtype, pd.CategoricalDtype)]
+        df = pd.concat([chunk.drop(columns=category_cols) for chunk in parsed], ignore_index=True)
+        df = df.assign(**{
+            col: union_categoricals([chunk[col] for chunk in parsed], sort_categories=True)
+            for col in category_cols
+        })
+        return self.transform(df[parsed[0].columns])
 
 
 def transform_data(df):
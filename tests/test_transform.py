@@ -0,0 +1,189 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.extract import DataExtractor
+from src.transform import DataTransformer
+
+
+def _write_trades(path, n_rows, seed=0):
+    """
+    Write a random trades CSV.
+    
+    The first fifth of the rows only uses the lexically last symbols and
+    client types, so a chunked read meets the other ones out of order.
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 60 * 24 * 60, n_rows), unit='min')
+    client_type = rng.choice(['silver', 'bronze', 'gold'], n_rows)
+    client_type[:n_rows // 5] = rng.choice(['silver', 'gold'], n_rows // 5)
+    symbol = rng.choice(['S4', 'S2', 'S3', 'S1'], n_rows)
+    symbol[:n_rows // 5] = rng.choice(['S4', 'S3'], n_rows // 5)
+    pd.DataFrame({
+        'timestamp': timestamps.strftime('%Y-%m-%d %H:%M:%S'),
+        'user_id': rng.integers(1, 20, n_rows),
+        'client_type': client_type,
+        'symbol': symbol,
+        'side': rng.choice(['sell', 'buy'], n_rows),
+        'quantity': rng.integers(1, 500, n_rows) / 100,
+        'price': rng.integers(5000, 20000, n_rows) / 100,
+    }).to_csv(path, index=False)
+
+
+class TestCalculateFifoPnl(unittest.TestCase):
+    def setUp(self):
+        self.transformer = DataTransformer(date_format='%Y-%m-%d %H:%M:%S')
+
+    def test_fifo_matches_hand_computed_weeks(self):
+        # Weeks start on Tuesday: 2023-01-03 and 2023-01-10
+        df = pd.DataFrame({
+            'timestamp': [
+                '2023-01-03 10:00:00', '2023-01-04 10:00:00', '2023-01-05 10:00:00', '2023-01-10 10:00:00',
+                '2023-01-03 11:00:00', '2023-01-04 11:00:00', '2023-01-06 11:00:00',
+            ],
+            'user_id': [1, 1, 1, 1, 2, 2, 2],
+            'client_type': ['gold', 'gold', 'gold', 'gold', 'bronze', 'bronze', 'bronze'],
+            'symbol': ['AAPL', 'AAPL', 'AAPL', 'AAPL', 'MSFT', 'MSFT', 'MSFT'],
+            'side': ['buy', 'buy', 'sell', 'sell', 'sell', 'sell', 'buy'],
+            'quantity': [10.0, 5.0, 12.0, 1.0, 4.0, 2.0, 5.0],
+            'price': [100.0, 110.0, 120.0, 105.0, 50.0, 55.0, 45.0],
+        })
+
+        agg_df, _ = self.transformer.transform(df)
+
+        # User 1 closes 10 @ 100 and part of the 110 lot, then carries 3 @ 110 into the next week.
+        # User 2 is short: buying 5 @ 45 closes 4 @ 50 and 1 @ 55, leaving 1 @ 55 short.
+        self.assertEqual(
+            agg_df['weekly_start_date'].dt.strftime('%Y-%m-%d').tolist(),
+            ['2023-01-03', '2023-01-03', '2023-01-10']
+        )
+        self.assertEqual(agg_df['user_id'].tolist(), [1, 2, 1])
+        self.assertEqual(agg_df['trade_volume'].tolist(), [2990.0, 535.0, 105.0])
+        self.assertEqual(agg_df['trade_count'].tolist(), [3, 3, 1])
+        self.assertEqual(agg_df['cumulative_trade_volume'].tolist(), [2990.0, 535.0, 3095.0])
+        self.assertEqual(agg_df['realized_pnl'].tolist(), [220.0, 30.0, -5.0])
+        self.assertEqual(agg_df['unrealized_pnl'].tolist(), [30.0, 10.0, -10.0])
+        self.assertEqual(agg_df['total_pnl'].tolist(), [250.0, 40.0, -15.0])
+
+    def test_week_last_price_skips_missing_prices(self):
+        df = pd.DataFrame({
+            'timestamp': ['2023-01-03 10:00:00', '2023-01-04 10:00:00', '2023-01-05 10:00:00'],
+            'user_id': [1, 1, 2],
+            'client_type': ['gold', 'gold', 'gold'],
+            'symbol': ['AAPL', 'AAPL', 'AAPL'],
+            'side': ['buy', 'buy', 'sell'],
+            'quantity': [1.0, 1.0, 1.0],
+            'price': [100.0, 110.0, np.nan],
+        })
+
+        agg_df, _ = self.transformer.transform(df)
+        user_1 = agg_df[agg_df['user_id'] == 1].iloc[0]
+
+        self.assertEqual(user_1['unrealized_pnl'], 10.0)
+        self.assertEqual(user_1['total_pnl'], 10.0)
+
+    def test_side_sign_is_optional(self):
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime(['2023-01-03 10:00:00', '2023-01-04 10:00:00']),
+            'user_id': [1, 1],
+            'client_type': ['gold', 'gold'],
+            'symbol': ['AAPL', 'AAPL'],
+            'side': ['buy', 'sell'],
+            'quantity': [5.0, 5.0],
+            'price': [100.0, 110.0],
+        })
+
+        result = self.transformer.calculate_fifo_pnl(self.transformer.create_weekly_date(df))
+
+        self.assertEqual(result['realized_pnl'].tolist(), [50.0])
+
+
+class TestCalculateClientPnl(unittest.TestCase):
+    def test_closed_round_trip_has_no_unrealized_pnl(self):
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime(['2023-01-03 10:00:00', '2023-01-04 10:00:00']),
+            'user_id': [1, 1],
+            'client_type': ['gold', 'gold'],
+            'symbol': ['AAPL', 'AAPL'],
+            'side': ['buy', 'sell'],
+            'quantity': [5.0, 5.0],
+            'price': [100.0, 110.0],
+        })
+
+        with np.errstate(all='raise'):
+            client_pnl = DataTransformer().calculate_client_pnl(df).iloc[0]
+
+        self.assertEqual(client_pnl['unrealized_pnl'], 0.0)
+        self.assertEqual(client_pnl['realized_pnl'], 50.0)
+
+    def test_symbol_without_price_does_not_void_user_pnl(self):
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime(['2023-01-03 10:00:00', '2023-01-04 10:00:00', '2023-01-05 10:00:00']),
+            'user_id': [1, 1, 1],
+            'client_type': ['bronze', 'bronze', 'bronze'],
+            'symbol': ['AAPL', 'AAPL', 'TSLA'],
+            'side': ['buy', 'buy', 'buy'],
+            'quantity': [1.0, 1.0, 1.0],
+            'price': [100.0, 110.0, np.nan],
+        })
+
+        client_pnl = DataTransformer().calculate_client_pnl(df).iloc[0]
+
+        self.assertEqual(client_pnl['unrealized_pnl'], 10.0)
+        self.assertEqual(client_pnl['total_pnl'], 10.0)
+
+
+class TestTransformPaths(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp_dir.name, 'trades.csv')
+        _write_trades(self.input_path, 2000)
+        self.extractor = DataExtractor(self.input_path)
+        self.transformer = DataTransformer(date_format='%Y-%m-%d %H:%M:%S')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_chunked_read_matches_single_read(self):
+        agg_df, client_pnl_df = self.transformer.transform(self.extractor.extract())
+        chunked_agg_df, chunked_client_pnl_df = self.transformer.transform_chunks(
+            self.extractor.extract(chunk_size=300)
+        )
+
+        pd.testing.assert_frame_equal(chunked_agg_df, agg_df)
+        pd.testing.assert_frame_equal(chunked_client_pnl_df, client_pnl_df)
+
+    @unittest.skipUnless(importlib.util.find_spec('polars'), 'polars is not installed')
+    def test_polars_pipeline_matches_pandas(self):
+        agg_df, client_pnl_df = self.transformer.transform(self.extractor.extract())
+        pl_agg_df, pl_client_pnl_df = self.transformer.transform_pl(self.extractor.scan())
+
+        # polars hands dates over with millisecond resolution; the dates themselves must agree
+        pl_agg_df = pl_agg_df.astype({'weekly_start_date': agg_df['weekly_start_date'].dtype})
+        pd.testing.assert_frame_equal(pl_agg_df, agg_df)
+        pd.testing.assert_frame_equal(pl_client_pnl_df, client_pnl_df)
+
+
+class TestCleanData(unittest.TestCase):
+    def test_non_numeric_user_ids_are_kept(self):
+        df = pd.DataFrame({
+            'timestamp': ['2023-01-03 10:00:00', '2023-01-04 10:00:00'],
+            'user_id': ['U1', 'U2'],
+            'client_type': ['gold', 'bronze'],
+            'symbol': ['AAPL', 'AAPL'],
+            'side': ['buy', 'sell'],
+            'quantity': [1.0, 1.0],
+            'price': [100.0, 110.0],
+        })
+
+        cleaned = DataTransformer().clean_data(df)
+
+        self.assertEqual(cleaned['user_id'].tolist(), ['U1', 'U2'])
+
+
+if __name__ == '__main__':
+    unittest.main()